@@ -0,0 +1,17 @@
+"""
+Shared pytest fixtures for the test scripts
+"""
+
+import pytest
+
+from drug_ecmo_analyzer import DrugECMOAnalyzer
+
+
+@pytest.fixture(scope="session")
+def meropenem_effect_result():
+    """'Effect on ECMO' for meropenem, analyzed once per test session and shared by the tests"""
+    analyzer = DrugECMOAnalyzer(
+        drug_name="meropenem",
+        paper_directory="./drugs/meropenem"
+    )
+    return analyzer.analyze_field("Effect on ECMO")
@@ -3,11 +3,24 @@
 Debug script to understand the response structure for metadata extraction
 """
 
-from paperqa import ask, Settings
-from paperqa.settings import PromptSettings
+
+def public_attrs(obj) -> list:
+    """List an object's data attributes without walking its whole MRO via dir()."""
+    from pydantic import BaseModel
+
+    # Fast path: paper-qa's response objects are pydantic models
+    if isinstance(obj, BaseModel):
+        return list(type(obj).model_fields.keys())
+    try:
+        return [attr for attr in vars(obj) if not attr.startswith('_')]
+    except TypeError:  # No __dict__ (e.g. __slots__ classes)
+        return [attr for attr in dir(obj) if not attr.startswith('_')]
 
 def debug_response_structure():
     """Debug the response structure to understand context attributes"""
+    # Imported here: paper-qa's import chain is slow and only needed for an actual run
+    from paperqa import ask, Settings
+    from paperqa.settings import PromptSettings
 
     settings = Settings(
         prompts=PromptSettings(
@@ -25,11 +38,11 @@ def debug_response_structure():
 
     print("=== RESPONSE STRUCTURE DEBUG ===")
     print(f"Response type: {type(response)}")
-    print(f"Response attributes: {[attr for attr in dir(response) if not attr.startswith('_')]}")
+    print(f"Response attributes: {public_attrs(response)}")
 
     if hasattr(response, 'session'):
         print(f"\nSession type: {type(response.session)}")
-        print(f"Session attributes: {[attr for attr in dir(response.session) if not attr.startswith('_')]}")
+        print(f"Session attributes: {public_attrs(response.session)}")
 
         if hasattr(response.session, 'contexts'):
             print(f"\nContexts type: {type(response.session.contexts)}")
@@ -38,12 +51,12 @@ def debug_response_structure():
             if response.session.contexts:
                 first_context = response.session.contexts[0]
                 print(f"\nFirst context type: {type(first_context)}")
-                print(f"First context attributes: {[attr for attr in dir(first_context) if not attr.startswith('_')]}")
+                print(f"First context attributes: {public_attrs(first_context)}")
 
                 if hasattr(first_context, 'doc'):
                     print(f"\nDoc type: {type(first_context.doc)}")
                     if first_context.doc:
-                        print(f"Doc attributes: {[attr for attr in dir(first_context.doc) if not attr.startswith('_')]}")
+                        print(f"Doc attributes: {public_attrs(first_context.doc)}")
 
                         if hasattr(first_context.doc, 'citation'):
                             print(f"\nCitation: {first_context.doc.citation}")
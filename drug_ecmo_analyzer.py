@@ -3,290 +3,1103 @@ Drug ECMO Analysis Tool
 A configurable system for analyzing drug effects and recommendations for ECMO use in children.
 """
 
+import asyncio
+import copy
+import hashlib
+import importlib.util
 import json
-from typing import Dict, Any, Optional
-from paperqa import ask, Settings
-from paperqa.settings import PromptSettings
+import os
+import pickle
+import re
+from collections import OrderedDict
+from contextlib import AsyncExitStack, asynccontextmanager
+from functools import lru_cache
+from pathlib import Path
+from types import MappingProxyType
+from typing import TYPE_CHECKING, AsyncIterator, Callable, Dict, Any, List, Mapping, Optional
+
+# paper-qa (and LiteLLM/httpx underneath it) take seconds to import, so they are
+# imported where they are used; importing this module stays cheap.
+if TYPE_CHECKING:
+    from paperqa import Docs, PQASession, Settings
+    from paperqa.settings import IndexSettings
+
+try:
+    import orjson  # Optional: much faster JSON serialization
+except ImportError:
+    orjson = None
+
+# Default local cache root (parsed paper index, query results, LLM/embedding responses)
+_DEFAULT_CACHE_DIR = "./cache"
+_QUERY_CACHE_MAX_ENTRIES = 256
+
+_LLM = "gpt-4o-mini"  # Faster, cheaper model to avoid rate limits
+_SHORT_LLM = "gpt-4.1-nano"  # Answer model for fields with short, extractive answers
+_TEMPERATURE = 0.0  # Deterministic, so identical requests can hit response/prompt caches
+
+# Chunks are embedded in batches of _EMBEDDING_BATCH_SIZE inputs per request (paper-qa's
+# default is 16). 128 chunks stay well under OpenAI's per-request token limit.
+_EMBEDDING = "text-embedding-3-small"
+_EMBEDDING_BATCH_SIZE = 128
+
+# Answer-model backends: OpenAI model -> backend model, plus extra LiteLLM call
+# parameters. Models not listed are used as given. Embeddings and evidence
+# summaries stay on OpenAI.
+_BACKENDS: Dict[str, Dict[str, Any]] = {
+    "openai": {"models": {}, "litellm_params": {}},
+    "bedrock": {
+        # Latency-optimized inference (Bedrock cross-region profile for Claude 3.5 Haiku)
+        "models": {
+            _LLM: "bedrock/us.anthropic.claude-3-5-haiku-20241022-v1:0",
+            _SHORT_LLM: "bedrock/us.anthropic.claude-3-5-haiku-20241022-v1:0"
+        },
+        "litellm_params": {"performanceConfig": {"latency": "optimized"}}
+    },
+    "groq": {
+        "models": {_LLM: "groq/llama-3.3-70b-versatile", _SHORT_LLM: "groq/llama-3.1-8b-instant"},
+        "litellm_params": {}
+    }
+}
+
+# Connection pool shared by all LLM/embedding requests of one analysis run.
+# HTTP/2 needs the optional `h2` package.
+_HTTP_MAX_KEEPALIVE_CONNECTIONS = 20
+_HTTP_MAX_CONNECTIONS = 50
+_HTTP_TIMEOUT = 60.0
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+# Pool installed as `litellm.aclient_session` by _shared_http_client, and how many calls use it
+_http_client = None
+_http_client_users = 0
+
+# Per-request LiteLLM options that skip the process-wide response cache, for use_cache=False
+_NO_LLM_CACHE = MappingProxyType({"cache": {"no-cache": True, "no-store": True}})
+# Set once enabling the disk response cache failed, so the warning is printed only once
+_llm_cache_unavailable = False
+
+# "References" section of paper-qa's formatted_answer and its numbered entries,
+# e.g. "1. (pqac-1234abcd): Smith J, et al. ..." -> "Smith J, et al. ..."
+_REFERENCES_HEADER_RE = re.compile(r'^[ \t]*References\b.*$', re.MULTILINE)
+_NUMBERED_REF_RE = re.compile(r'^[ \t]*[1-5]\.[ \t]*(?:[^:\n]*:[ \t]*(\S.*?)|([^:\n]*[^:\s]))[ \t]*$', re.MULTILINE)
+
+# Single-value answers for value_pattern lookups; group 1 is the whole answer.
+# LogP must be a decimal, so counts and years ("logP of 23 compounds") don't match.
+_LOGP_RE = re.compile(
+    r'\blog\s*P\b(?:\s*\([^)]{0,30}\))?\s*(?:of|[:=]|value of|is|was)?\s*([-\u2212]?\d+\.\d+)', re.IGNORECASE
+)
+_PROTEIN_BINDING_RE = re.compile(
+    r'\bprotein[- ]binding\b\s*(?:of|[:=]|is|was)?\s*(?:approximately|about|~)?\s*(\d{1,3}(?:\.\d+)?\s*%)',
+    re.IGNORECASE
+)
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# Citation keyword tables for _extract_reference_details, in priority order
+# (the first listed entry wins when a citation matches several).
+_STUDY_TYPES = [
+    ('randomized|rct', "Randomized controlled trial", "high-quality RCT"),
+    ('prospective|cohort', "Prospective observational study", "moderate-quality observational study"),
+    ('case report|case series', "Case report/series", "case-based evidence"),
+    ('review', "Literature review", "narrative review"),
+    ('guideline', "Clinical guideline", "expert consensus guideline"),
+    ('pharmacokinetics', "Pharmacokinetic study", "specialized PK research"),
+]
+_DEFAULT_STUDY_TYPE = ("Clinical research study", "peer-reviewed research")
+
+_POPULATIONS = [
+    ('pediatric|children', "pediatric ECMO patients"),
+    ('adult', "adult ECMO patients"),
+]
+_DEFAULT_POPULATION = "ECMO patients"
+
+
+def _keyword_table_re(patterns: list) -> "re.Pattern[str]":
+    """Compile keyword patterns into one regex with a named group (g0, g1, ...) per entry."""
+    return re.compile('|'.join(f'(?P<g{i}>{pattern})' for i, pattern in enumerate(patterns)), re.IGNORECASE)
+
+
+def _first_table_match(regex: "re.Pattern[str]", text: str) -> Optional[int]:
+    """Index of the highest-priority table entry found in text, or None."""
+    matched = {int(m.lastgroup[1:]) for m in regex.finditer(text)}
+    return min(matched) if matched else None
+
+
+_STUDY_RE = _keyword_table_re([pattern for pattern, _, _ in _STUDY_TYPES])
+_POPULATION_RE = _keyword_table_re([pattern for pattern, _ in _POPULATIONS])
+
+# Optional per-field keys: "llm" (answer model, default _LLM), "max_tokens" (answer
+# length cap; set a matching "answer_length" so the answer isn't cut off),
+# "value_pattern" (compiled regex whose group 1 is the whole answer; when it matches
+# the retrieved chunks consistently, no LLM is called), and the following, passed
+# through to paper-qa's AnswerSettings
+_ANSWER_SETTING_KEYS = (
+    "answer_length", "evidence_k", "evidence_summary_length", "evidence_skip_summary", "answer_max_sources",
+    "max_concurrent_requests"
+)
+
+# Retrieval depth for value_pattern lookups, and how many distinct papers must report the same value
+_VALUE_LOOKUP_K = 5
+_VALUE_LOOKUP_MIN_PAPERS = 2
+_VALUE_QUOTE_CONTEXT = 150  # Characters quoted on each side of a matched value
+
+# Shared opening of every system prompt. Keeping it identical across fields (and
+# the field-specific task last) lets providers reuse the cached prompt prefix.
+_SYSTEM_PROMPT_PREFIX = (
+    "You are a clinical pharmacologist and pediatric pharmacist reviewing published studies on "
+    "{drug_name} during extracorporeal membrane oxygenation (ECMO) in pediatric patients. "
+    "Base every answer strictly on the provided evidence, quote investigators accurately, "
+    "and say so when the evidence is insufficient."
+)
+
+# The rest of the shared preamble, in order: general evidence-handling rules,
+# drug-agnostic ECMO pharmacokinetics, how to weigh individual studies, and
+# output conventions.
+_EVIDENCE_GUIDELINES = (
+    "Evidence guidelines:\n"
+    "- Prefer pediatric and neonatal ECMO data; when only adult or ex vivo circuit data exist, say so explicitly.\n"
+    "- Distinguish in vivo pharmacokinetic studies, ex vivo (closed-loop) circuit experiments, case reports and "
+    "reviews, and weigh them in that order.\n"
+    "- Report numeric values (doses, clearance, Vd, circuit recovery, LogP, protein binding) with their units, "
+    "population and sampling conditions exactly as published.\n"
+    "- Note the ECMO configuration when reported (VA or VV, oxygenator and tubing material, circuit priming, "
+    "concurrent CRRT), since it changes sequestration and clearance.\n"
+    "- When studies disagree, report the range and the direction most of the evidence supports rather than "
+    "picking a single value.\n"
+    "- Do not extrapolate from other drugs or infer values that the evidence does not state."
+)
+
+_ECMO_PK_BACKGROUND = (
+    "ECMO pharmacokinetic background:\n"
+    "- The circuit adds priming volume (crystalloid, albumin or blood products) that dilutes the drug and "
+    "expands the volume of distribution, most markedly in neonates and infants whose blood volume is small "
+    "relative to the circuit.\n"
+    "- Lipophilic and highly protein-bound drugs are sequestered by the oxygenator membrane and PVC tubing. "
+    "Sequestration is largest in a new circuit, decreases as binding sites saturate, and rises again after an "
+    "oxygenator or circuit change.\n"
+    "- Hydrophilic drugs with low protein binding are affected mainly through changes in volume of distribution "
+    "and renal clearance rather than by sequestration.\n"
+    "- Systemic inflammation, capillary leak, fluid overload and altered organ perfusion can increase the volume "
+    "of distribution and change hepatic and renal clearance independently of the circuit.\n"
+    "- Concurrent continuous renal replacement therapy (CRRT) adds extracorporeal clearance, particularly for "
+    "small, hydrophilic, poorly protein-bound drugs.\n"
+    "- Organ maturation means neonatal, infant, child and adolescent data are not interchangeable; report the "
+    "age group each finding comes from.\n"
+    "- Ex vivo circuit studies isolate sequestration but omit patient metabolism and elimination; in vivo "
+    "studies capture the combined effect but are usually small and heterogeneous."
+)
+
+_STUDY_APPRAISAL = (
+    "Study appraisal:\n"
+    "- Note the number of patients and samples; a single case report cannot establish a population-level "
+    "effect.\n"
+    "- Prefer studies with rich or population pharmacokinetic sampling and validated drug assays over sparse "
+    "therapeutic drug monitoring data.\n"
+    "- Check whether concentrations were measured in the patient, before and after the oxygenator, or in the "
+    "circuit only.\n"
+    "- Record whether target attainment was assessed against a stated pharmacodynamic target (time above MIC, "
+    "AUC/MIC or a trough range) and whether it was met.\n"
+    "- Record circuit age, blood flow rate and time on ECMO at sampling, since sequestration and clearance change "
+    "over the course of a run.\n"
+    "- Distinguish observed concentrations from model-simulated dosing regimens, and say which one a "
+    "recommendation is based on.\n"
+    "- Treat conference abstracts and letters as weaker evidence than full peer-reviewed reports.\n"
+    "- Flag conflicts between a study's data and its authors' conclusions instead of repeating the conclusion."
+)
+
+_ANSWER_CONVENTIONS = (
+    "Answer conventions:\n"
+    "- Answer only the task given at the end of this prompt; the field list below is context, not additional "
+    "questions.\n"
+    "- Keep the requested answer format and length, without preambles, disclaimers or a restated question.\n"
+    "- Support each statement with the citation keys of the context it comes from.\n"
+    "- Use generic drug names and standard units (mg/kg, mg/kg/day, L/kg, mL/min/kg, %, hours).\n"
+    "- State dosing intervals explicitly and whether a dose is a loading or a maintenance dose.\n"
+    "- Keep summary statistics in their published form: median with range or interquartile range, or mean "
+    "with standard deviation.\n"
+    "- If the evidence covers only adults or ex vivo circuits, answer from it and say that pediatric data are "
+    "lacking."
+)
+
+# The 7 analysis fields. {drug_name} is substituted when a field is queried;
+# each system_prompt is appended to _SYSTEM_PROMPT_PREFIX. Built once and frozen
+# below; analyzers copy it into their own mutable analysis_fields.
+_FIELD_TEMPLATES: Mapping[str, Mapping[str, Any]] = {
+    "Effect on ECMO": {
+        "definition": "Summarize all the investigators' conclusions regarding the effect of ECMO on the drug.",
+        "structure": "A single short sentence that summarizes the impact on ECMO, e.g. - no change, minimal impact on PK, significant impact on PK, significant sequestration is possible, effect unknown.",
+        "question_template": "What is the effect of ECMO on {drug_name}? Summarize all investigators' conclusions about how ECMO affects {drug_name} pharmacokinetics and pharmacodynamics.",
+        "system_prompt": "Task: analyze the effect of ECMO on {drug_name}. Focus on pharmacokinetic and pharmacodynamic changes. Provide a concise summary of all investigators' conclusions. Structure your response as a single short sentence indicating the impact level (no change, minimal impact, significant impact, significant sequestration possible, or effect unknown).",
+        "max_tokens": 150,
+        "answer_length": "one short sentence, under 40 words",
+        "evidence_k": 10,
+        "answer_max_sources": 3
+    },
+
+    "Final Recommendation": {
+        "definition": "Collect all recommendations on dose adjustment of the drug from the studies we provided.",
+        "structure": "Generate/formulate a recommendation according to the accumulated data found on the drug. E.g., Standard dose, Dose at high end of normal range, increased dosing suggested: 2 gm IV (bolus) q8h, or 2 gm IV (over 4 hr) q12h, Insufficient data for a recommendation, Increased dosing suggested, Increase loading dose duration. Start at 6 mg/kg IV q12h x2 days (or after oxygenator change) and then reduce dose to 3–4 mg/kg q24h",
+        "question_template": "What are all the dosing recommendations for {drug_name} when used during ECMO in pediatric patients? Compile all dose adjustment recommendations from the available studies.",
+        "system_prompt": "Task: compile dosing recommendations for {drug_name} during ECMO. Review all available studies and synthesize a clear dosing recommendation. Include specific doses, routes, frequencies, and any special considerations for pediatric ECMO patients. Format as a clear recommendation statement.",
+        "max_tokens": 512,
+        "answer_length": "about 150 words",
+        "evidence_k": 10,
+        "answer_max_sources": 5
+    },
+
+    "Volume of distribution (Vd)": {
+        "definition": "When using ECMO, is there a change in the drug's Vd compared to treatment without ECMO?",
+        "structure": "A concise answer: no change / increased / decreased (add original quotations and references)",
+        "question_template": "How does ECMO affect the volume of distribution (Vd) of {drug_name}? Compare Vd values during ECMO versus standard treatment.",
+        "system_prompt": "Task: analyze pharmacokinetic changes for {drug_name} during ECMO. Focus specifically on volume of distribution changes. Compare Vd values between ECMO and non-ECMO conditions. Provide a concise answer: no change, increased, or decreased. Include exact quotations and references.",
+        "llm": _SHORT_LLM,
+        "max_tokens": 256,
+        "answer_length": "under 80 words, including quotations",
+        "evidence_k": 10,
+        "answer_max_sources": 3
+    },
+
+    "Circuit sequestration": {
+        "definition": "Summarize the known evidence regarding sequestration of the drug in the ECMO circuit tubing.",
+        "structure": "Summarize in one or two words: no sequestration / minimal / high (add in parentheses original quotations, tubing type if known, and references)",
+        "question_template": "What is the evidence for {drug_name} sequestration in ECMO circuit tubing? Include information about tubing types and sequestration levels.",
+        "system_prompt": "Task: evaluate {drug_name} sequestration in ECMO circuits. Focus on circuit binding, tubing material effects, and drug loss. Categorize sequestration as: no sequestration, minimal, or high. Include original quotations, tubing types when available, and specific references.",
+        "llm": _SHORT_LLM,
+        "max_tokens": 256,
+        "answer_length": "under 80 words, including quotations",
+        "evidence_k": 10,
+        "answer_max_sources": 3
+    },
+
+    "ECMO dosage": {
+        "definition": "What is the recommended dosing range for treatment on ECMO?",
+        "structure": "Provide a short one-sentence answer with minimum and maximum dose by indication.",
+        "question_template": "What is the recommended dosing range for {drug_name} during ECMO treatment in pediatric patients? Include minimum and maximum doses by indication.",
+        "system_prompt": "Task: determine therapeutic dosing ranges for {drug_name} during pediatric ECMO. Identify minimum and maximum recommended doses for different indications. Provide a concise one-sentence answer with specific dose ranges and indications.",
+        "llm": _SHORT_LLM,
+        "max_tokens": 150,
+        "answer_length": "one sentence, under 40 words",
+        "evidence_k": 10,
+        "answer_max_sources": 3
+    },
+
+    "PK Properties -LogP": {
+        "definition": "Crop the LogP of the drug.",
+        "structure": "Provide the absolute number.",
+        "question_template": "What is the LogP (partition coefficient) value for {drug_name}? Provide the specific numerical value.",
+        "system_prompt": "Task: extract pharmacokinetic properties for {drug_name}. Find and report the LogP (lipophilicity) value. Provide only the numerical value without additional explanation.",
+        # Single-number lookup: read it straight from the papers when they agree, otherwise
+        # small model, minimal retrieval, raw chunks (no LLM summary/rerank step)
+        "value_pattern": _LOGP_RE,
+        "llm": _SHORT_LLM,
+        "max_tokens": 48,
+        "answer_length": "a single number",
+        "evidence_k": 3,
+        "evidence_skip_summary": True,
+        "answer_max_sources": 1
+    },
+
+    "PK Properties - Protein Binding": {
+        "definition": "Crop the protein binding of the drug.",
+        "structure": "Provide the percentage / percentage range.",
+        "question_template": "What is the protein binding percentage for {drug_name}? Provide the specific percentage or percentage range.",
+        "system_prompt": "Task: extract pharmacokinetic properties for {drug_name}. Find and report the protein binding percentage. Provide only the percentage value or range without additional explanation.",
+        # Single-number lookup, as for LogP
+        "value_pattern": _PROTEIN_BINDING_RE,
+        "llm": _SHORT_LLM,
+        "max_tokens": 48,
+        "answer_length": "a single percentage or range",
+        "evidence_k": 3,
+        "evidence_skip_summary": True,
+        "answer_max_sources": 1
+    }
+}
+_FIELD_TEMPLATES = MappingProxyType({name: MappingProxyType(info) for name, info in _FIELD_TEMPLATES.items()})
+
+
+@lru_cache(maxsize=None)
+def _format_for_drug(template: str, drug_name: str) -> str:
+    """
+    Substitute {drug_name} into a question or prompt template (memoized).
+
+    Only that placeholder is replaced, so other braces (e.g. JSON examples in a
+    custom field's structure) are left as written.
+    """
+    return template.replace("{drug_name}", drug_name)
+
+
+def _dumps_json(obj: Any, indent: bool = True) -> bytes:
+    """Serialize to UTF-8 JSON bytes, with orjson when available."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 if indent else 0)
+    if indent:
+        return json.dumps(obj, indent=2, ensure_ascii=False).encode('utf-8')
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+
+def _parse_json_object(text: str) -> Dict[str, Any]:
+    """Parse the outermost {...} object in an LLM answer (empty dict if there is none)."""
+    start, end = text.find('{'), text.rfind('}')
+    if start == -1 or end < start:
+        return {}
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except json.JSONDecodeError:
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
+def _enable_llm_cache(cache_dir: str) -> None:
+    """
+    Persist LiteLLM completion and embedding responses on disk.
+
+    Entries are keyed by a SHA-256 hash of the call parameters (model, messages or
+    input, temperature, ...), so repeated identical calls return instantly and free.
+    The cache is process-wide: the first analyzer to enable it picks the directory,
+    and any cache the caller already configured on litellm is left in place.
+    Analyzers with use_cache=False bypass it per request (see _NO_LLM_CACHE).
+    """
+    global _llm_cache_unavailable
+    import litellm
+
+    if litellm.cache is not None or _llm_cache_unavailable:
+        return
+    try:
+        litellm.enable_cache(
+            type="disk",
+            disk_cache_dir=os.path.join(cache_dir, "litellm"),
+            supported_call_types=["completion", "acompletion", "embedding", "aembedding"]
+        )
+    except ImportError as e:  # Disk cache needs the `diskcache` package
+        _llm_cache_unavailable = True
+        print(f"Warning: LLM response cache disabled: {e}")
+
+
+def _base_settings_kwargs(use_llm_cache: bool = True) -> Dict[str, Any]:
+    """
+    Settings shared by paper ingestion and every field query.
+
+    The paper directory is not among them: Docs.aquery never reads it, and papers are
+    listed by DrugECMOAnalyzer._paper_paths.
+    """
+    kwargs = {
+        "temperature": _TEMPERATURE,
+        "llm": _LLM,
+        "summary_llm": _LLM,
+        "embedding": _EMBEDDING,
+        "embedding_config": {"batch_size": _EMBEDDING_BATCH_SIZE}
+    }
+    if not use_llm_cache:
+        kwargs["llm_config"] = _llm_config(_LLM, **_NO_LLM_CACHE)
+        kwargs["summary_llm_config"] = _llm_config(_LLM, **_NO_LLM_CACHE)
+        kwargs["embedding_config"]["kwargs"] = dict(_NO_LLM_CACHE)
+    return kwargs
+
+
+def _llm_config(model: str, **litellm_params: Any) -> Dict[str, Any]:
+    """LiteLLM router config for one model, as paper-qa builds by default, plus extra call parameters."""
+    return {
+        "name": model,
+        "model_list": [{
+            "model_name": model,
+            "litellm_params": {"model": model, "temperature": _TEMPERATURE, **litellm_params}
+        }]
+    }
+
+
+def _batch_response_format(field_names: List[str]) -> Dict[str, Any]:
+    """Structured-output schema for the batched query: one required string answer per field."""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "drug_analysis_batch",
+            "strict": True,
+            "schema": {
+                "type": "object",
+                "properties": {name: {"type": "string"} for name in field_names},
+                "required": list(field_names),
+                "additionalProperties": False
+            }
+        }
+    }
+
+
+def _backend_llm(backend: str, model: str, use_llm_cache: bool = True, **litellm_params: Any) -> Dict[str, Any]:
+    """Settings kwargs (llm, llm_config) for running `model` on the given answer-model backend."""
+    llm = _BACKENDS[backend]["models"].get(model, model)
+    if not use_llm_cache:
+        litellm_params.update(_NO_LLM_CACHE)
+    return {"llm": llm, "llm_config": _llm_config(llm, **_BACKENDS[backend]["litellm_params"], **litellm_params)}
+
+
+@lru_cache(maxsize=128)
+def _build_settings(system_prompt: str, answer_overrides: tuple = (),
+                    llm: str = _LLM, max_tokens: Optional[int] = None, backend: str = "openai",
+                    use_llm_cache: bool = True) -> "Settings":
+    """
+    Build (and memoize) the paper-qa Settings for one formatted system prompt.
+
+    answer_overrides is a tuple of (AnswerSettings field, value) pairs so it stays hashable.
+    llm, max_tokens and backend apply to the answer model only; evidence summaries keep _LLM.
+    """
+    from paperqa import Settings
+    from paperqa.settings import AnswerSettings, PromptSettings
+
+    kwargs = _base_settings_kwargs(use_llm_cache)
+    if llm != _LLM or max_tokens is not None or backend != "openai":
+        llm_params = {"max_tokens": max_tokens} if max_tokens is not None else {}
+        kwargs.update(_backend_llm(backend, llm, use_llm_cache, **llm_params))
+
+    return Settings(
+        prompts=PromptSettings(
+            system=system_prompt,
+            use_json=True
+        ),
+        answer=AnswerSettings(**dict(answer_overrides)),
+        **kwargs
+    )
 
 
 class DrugECMOAnalyzer:
     """Configurable analyzer for drug effects on ECMO in pediatric patients."""
 
-    def __init__(self, drug_name: str, paper_directory: Optional[str] = None):
+    def __init__(self, drug_name: str, paper_directory: Optional[str] = None, max_concurrent: int = 5,
+                 use_cache: bool = True, cache_dir: str = _DEFAULT_CACHE_DIR, backend: str = "openai"):
         """
         Initialize the analyzer with a specific drug.
 
         Args:
             drug_name: Name of the drug to analyze (e.g., "meropenem")
             paper_directory: Directory containing relevant PDF papers
+            max_concurrent: Maximum number of fields analyzed in parallel (rate-limit guard)
+            use_cache: Reuse results of previously asked questions instead of re-querying paper-qa,
+                and cache the paper index and LLM/embedding responses on disk
+            cache_dir: Directory for all on-disk caches
+            backend: Answer-model provider: "openai", "bedrock" (latency-optimized inference)
+                or "groq"
         """
+        if backend not in _BACKENDS:
+            raise ValueError(f"Unknown backend: {backend}. Available backends: {list(_BACKENDS.keys())}")
+
         self.drug_name = drug_name.lower()
         self.paper_directory = paper_directory or f"./drugs/{self.drug_name}"
+        self.max_concurrent = max_concurrent
+        self.backend = backend
+        self._docs: Optional["Docs"] = None  # Built once on first analysis, shared by all fields
+        self._http_stack: Optional[AsyncExitStack] = None  # Open while used as `async with analyzer:`
+        self.use_cache = use_cache
+        self.cache_dir = cache_dir
+        self._query_cache_path = os.path.join(cache_dir, f"{self.drug_name}_qcache.pkl")
+        self._query_cache = self._load_query_cache() if use_cache else OrderedDict()
 
-        # Define the 7 analysis fields
-        self.analysis_fields = {
-            "Effect on ECMO": {
-                "definition": "Summarize all the investigators' conclusions regarding the effect of ECMO on the drug.",
-                "structure": "A single short sentence that summarizes the impact on ECMO, e.g. - no change, minimal impact on PK, significant impact on PK, significant sequestration is possible, effect unknown.",
-                "question_template": "What is the effect of ECMO on {drug_name}? Summarize all investigators' conclusions about how ECMO affects {drug_name} pharmacokinetics and pharmacodynamics.",
-                "system_prompt": f"You are a clinical pharmacologist analyzing the effect of ECMO on {self.drug_name}. Focus on pharmacokinetic and pharmacodynamic changes. Provide a concise summary of all investigators' conclusions. Structure your response as a single short sentence indicating the impact level (no change, minimal impact, significant impact, significant sequestration possible, or effect unknown)."
-            },
-
-            "Final Recommendation": {
-                "definition": "Collect all recommendations on dose adjustment of the drug from the studies we provided.",
-                "structure": "Generate/formulate a recommendation according to the accumulated data found on the drug. E.g., Standard dose, Dose at high end of normal range, increased dosing suggested: 2 gm IV (bolus) q8h, or 2 gm IV (over 4 hr) q12h, Insufficient data for a recommendation, Increased dosing suggested, Increase loading dose duration. Start at 6 mg/kg IV q12h x2 days (or after oxygenator change) and then reduce dose to 3–4 mg/kg q24h",
-                "question_template": "What are all the dosing recommendations for {drug_name} when used during ECMO in pediatric patients? Compile all dose adjustment recommendations from the available studies.",
-                "system_prompt": f"You are a pediatric pharmacist compiling dosing recommendations for {self.drug_name} during ECMO. Review all available studies and synthesize a clear dosing recommendation. Include specific doses, routes, frequencies, and any special considerations for pediatric ECMO patients. Format as a clear recommendation statement."
-            },
-
-            "Volume of distribution (Vd)": {
-                "definition": "When using ECMO, is there a change in the drug's Vd compared to treatment without ECMO?",
-                "structure": "A concise answer: no change / increased / decreased (add original quotations and references)",
-                "question_template": "How does ECMO affect the volume of distribution (Vd) of {drug_name}? Compare Vd values during ECMO versus standard treatment.",
-                "system_prompt": f"You are analyzing pharmacokinetic changes for {self.drug_name} during ECMO. Focus specifically on volume of distribution changes. Compare Vd values between ECMO and non-ECMO conditions. Provide a concise answer: no change, increased, or decreased. Include exact quotations and references."
-            },
-
-            "Circuit sequestration": {
-                "definition": "Summarize the known evidence regarding sequestration of the drug in the ECMO circuit tubing.",
-                "structure": "Summarize in one or two words: no sequestration / minimal / high (add in parentheses original quotations, tubing type if known, and references)",
-                "question_template": "What is the evidence for {drug_name} sequestration in ECMO circuit tubing? Include information about tubing types and sequestration levels.",
-                "system_prompt": f"You are evaluating {self.drug_name} sequestration in ECMO circuits. Focus on circuit binding, tubing material effects, and drug loss. Categorize sequestration as: no sequestration, minimal, or high. Include original quotations, tubing types when available, and specific references."
-            },
-
-            "ECMO dosage": {
-                "definition": "What is the recommended dosing range for treatment on ECMO?",
-                "structure": "Provide a short one-sentence answer with minimum and maximum dose by indication.",
-                "question_template": "What is the recommended dosing range for {drug_name} during ECMO treatment in pediatric patients? Include minimum and maximum doses by indication.",
-                "system_prompt": f"You are determining therapeutic dosing ranges for {self.drug_name} during pediatric ECMO. Identify minimum and maximum recommended doses for different indications. Provide a concise one-sentence answer with specific dose ranges and indications."
-            },
-
-            "PK Properties -LogP": {
-                "definition": "Crop the LogP of the drug.",
-                "structure": "Provide the absolute number.",
-                "question_template": "What is the LogP (partition coefficient) value for {drug_name}? Provide the specific numerical value.",
-                "system_prompt": f"You are extracting pharmacokinetic properties for {self.drug_name}. Find and report the LogP (lipophilicity) value. Provide only the numerical value without additional explanation."
-            },
-
-            "PK Properties - Protein Binding": {
-                "definition": "Crop the protein binding of the drug.",
-                "structure": "Provide the percentage / percentage range.",
-                "question_template": "What is the protein binding percentage for {drug_name}? Provide the specific percentage or percentage range.",
-                "system_prompt": f"You are extracting pharmacokinetic properties for {self.drug_name}. Find and report the protein binding percentage. Provide only the percentage value or range without additional explanation."
-            }
-        }
+        # Per-instance copy of the 7 analysis fields, so customizing one analyzer
+        # doesn't leak into others. Prompts keep their {drug_name} placeholder.
+        self.analysis_fields = {name: dict(info) for name, info in _FIELD_TEMPLATES.items()}
 
-    def create_analysis_settings(self, field_name: str) -> Settings:
-        """Create custom settings for a specific analysis field."""
+    def create_analysis_settings(self, field_name: str) -> "Settings":
+        """
+        Create custom settings for a specific analysis field.
+
+        Settings are memoized per formatted prompt and field options, so repeated
+        calls (and analyzers for the same drug) share one instance. Treat it as
+        read-only; use settings.model_copy(update=...) to vary it.
+        """
         field_info = self.analysis_fields[field_name]
+        system_prompt = self._system_prompt(field_info["system_prompt"])
+        answer_overrides = tuple((key, field_info[key]) for key in _ANSWER_SETTING_KEYS if key in field_info)
+
+        return _build_settings(system_prompt, answer_overrides,
+                               field_info.get("llm", _LLM), field_info.get("max_tokens"), self.backend,
+                               self.use_cache)
+
+    def _system_prompt(self, task_prompt: str) -> str:
+        """Full system prompt: the shared preamble followed by the task-specific instructions."""
+        return _format_for_drug(f"{self._shared_preamble()}\n\n{task_prompt}", self.drug_name)
+
+    def _shared_preamble(self) -> str:
+        """
+        Role, evidence rules, ECMO background and the list of analysis fields.
+
+        Identical for all fields of this analyzer, and long enough (about 1,150
+        tokens with the gpt-4o tokenizer) to cross OpenAI's 1,024-token minimum for
+        automatic prompt-prefix caching, so every call after the first reuses the
+        cached prefix. Answer structures are left to each field's task, since their
+        examples are field- and drug-specific.
+        """
+        lines = [
+            _SYSTEM_PROMPT_PREFIX, "", _EVIDENCE_GUIDELINES, "", _ECMO_PK_BACKGROUND, "", _STUDY_APPRAISAL, "",
+            _ANSWER_CONVENTIONS, "", "This review covers the following fields:"
+        ]
+        for name, info in self.analysis_fields.items():
+            lines.append(f'- "{name}": {info["definition"]} Question: {info["question_template"]}')
+        return "\n".join(lines)
 
-        return Settings(
-            prompts=PromptSettings(
-                system=field_info["system_prompt"],
-                use_json=True
-            ),
-            paper_directory=self.paper_directory,
-            temperature=0.1,  # Low temperature for consistency
-            llm="gpt-4o-mini",  # Faster, cheaper model to avoid rate limits
-            summary_llm="gpt-4o-mini"
+    async def _ensure_docs(self) -> "Docs":
+        """Load or build the paper index once; every field query reuses the result."""
+        if self.use_cache:
+            _enable_llm_cache(self.cache_dir)
+
+        if self._docs is None:
+            self._docs = await self._build_or_load_index()
+        return self._docs
+
+    async def _build_or_load_index(self) -> "Docs":
+        """
+        Return the parsed and embedded Docs index for the paper directory.
+
+        The index is pickled under the cache directory, keyed on the resolved paper
+        directory, a fingerprint of its papers and the ingestion settings (embedding
+        model and config, parsing and chunking), so later runs skip parsing and
+        embedding until a paper or one of those settings changes. Pickles for older
+        keys of the same drug and directory are removed; other paper directories for
+        the drug keep their own index. A paper that fails to parse or
+        embed is skipped with a warning instead of aborting the whole index.
+        """
+        from paperqa import Docs, Settings
+
+        settings_kwargs = _base_settings_kwargs(self.use_cache)
+        settings = Settings(**settings_kwargs)
+        paper_paths = self._paper_paths(settings.agent.index)
+        directory_key = hashlib.sha256(str(Path(self.paper_directory).resolve()).encode()).hexdigest()[:8]
+        cache_prefix = f"{self.drug_name}_docs_{directory_key}_"
+        index_key = hashlib.sha256("\n".join([
+            self._corpus_fingerprint(paper_paths),
+            json.dumps(settings_kwargs, sort_keys=True),
+            settings.parsing.model_dump_json()
+        ]).encode()).hexdigest()
+        cache_path = os.path.join(self.cache_dir, f"{cache_prefix}{index_key[:16]}.pkl")
+        if self.use_cache:
+            docs = self._load_docs(cache_path)
+            if docs is not None:
+                return docs
+
+        docs = Docs()
+        semaphore = asyncio.Semaphore(settings.agent.index.concurrency)
+
+        async def add_paper(path: Path) -> None:
+            async with semaphore:
+                try:
+                    await docs.aadd(path, settings=settings)
+                except Exception as e:
+                    print(f"Warning: skipping {path} (indexed again once the paper directory changes): {e}")
+
+        await asyncio.gather(*(add_paper(path) for path in paper_paths))
+
+        if self.use_cache:
+            self._save_docs(docs, cache_path)
+            for stale_path in Path(self.cache_dir).glob(f"{cache_prefix}*.pkl"):
+                if str(stale_path) != cache_path:
+                    stale_path.unlink(missing_ok=True)
+        return docs
+
+    def _paper_paths(self, index_settings: Optional["IndexSettings"] = None) -> List[Path]:
+        """
+        Files in the paper directory that paper-qa would index, as its own indexer lists them.
+
+        Subdirectories are searched unless `recurse_subdirectories` is off, and
+        `files_filter` (PDF, text, HTML and Markdown by default) is matched on the
+        lower-cased suffix, so "Smith2019.PDF" is picked up too.
+        """
+        if index_settings is None:
+            from paperqa.settings import IndexSettings
+            index_settings = IndexSettings()
+
+        paper_directory = Path(self.paper_directory)
+        if not paper_directory.is_dir():
+            return []
+        candidates = paper_directory.rglob("*") if index_settings.recurse_subdirectories else paper_directory.iterdir()
+        return sorted(
+            path for path in candidates
+            if path.is_file() and index_settings.files_filter(path.with_suffix(path.suffix.lower()))
         )
 
-    def analyze_field(self, field_name: str) -> Dict[str, Any]:
+    def _corpus_fingerprint(self, paper_paths: Optional[List[Path]] = None) -> str:
+        """SHA-256 over the relative path, mtime and size of every paper in the paper directory."""
+        if paper_paths is None:
+            paper_paths = self._paper_paths()
+        entries = []
+        for path in paper_paths:
+            stat = path.stat()
+            entries.append(f"{path.relative_to(self.paper_directory).as_posix()}:{stat.st_mtime_ns}:{stat.st_size}")
+        return hashlib.sha256("\n".join(entries).encode()).hexdigest()
+
+    @staticmethod
+    def _load_docs(cache_path: str) -> Optional["Docs"]:
+        """Load a pickled Docs index, restoring int8-quantized embeddings (None if missing or unreadable)."""
+        try:
+            with open(cache_path, 'rb') as f:
+                payload = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return None
+        if not isinstance(payload, dict):  # Index pickled without quantization
+            return payload
+
+        try:
+            docs = payload["docs"]
+            matrix = payload["embeddings"].astype("float32") * payload["scales"][:, None]
+            if len(matrix) != len(docs.texts):
+                return None
+        except (KeyError, AttributeError, TypeError, IndexError):  # Not a quantized index payload
+            return None
+        for text, embedding in zip(docs.texts, matrix):
+            text.embedding = embedding.tolist()
+        return docs
+
+    @staticmethod
+    def _save_docs(docs: "Docs", cache_path: str) -> None:
+        """
+        Pickle the Docs index atomically, with chunk embeddings quantized to int8.
+
+        Each vector is scaled by its own max |value|, so one byte per dimension
+        keeps cosine similarities within about 1% and the pickle ~4x smaller.
+        Falls back to a plain pickle if any chunk lacks an embedding.
+        """
+        import numpy as np
+
+        os.makedirs(os.path.dirname(cache_path) or '.', exist_ok=True)
+        tmp_path = f"{cache_path}.tmp"
+        embeddings = [text.embedding for text in docs.texts]
+        if not embeddings or any(embedding is None for embedding in embeddings):
+            with open(tmp_path, 'wb') as f:
+                pickle.dump(docs, f)
+            os.replace(tmp_path, cache_path)
+            return
+
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        quantized = np.round(matrix / scales[:, None]).astype(np.int8)
+
+        # Pickle the texts without their float embeddings, then put them back
+        for text in docs.texts:
+            text.embedding = None
+        try:
+            with open(tmp_path, 'wb') as f:
+                pickle.dump({"docs": docs, "embeddings": quantized, "scales": scales}, f)
+        finally:
+            for text, embedding in zip(docs.texts, embeddings):
+                text.embedding = embedding
+        os.replace(tmp_path, cache_path)
+
+    @asynccontextmanager
+    async def _shared_http_client(self) -> AsyncIterator[None]:
+        """
+        Route LiteLLM's OpenAI requests (LLM and embeddings) through one keep-alive pool.
+
+        paper-qa calls LLMs via LiteLLM, which uses `litellm.aclient_session` when set.
+        The pool is shared by every async call that overlaps with it and closed when the
+        last one exits: httpx clients are bound to the event loop that created them, so
+        they cannot outlive an asyncio.run. A pool installed by the caller is left alone.
+        """
+        global _http_client, _http_client_users
+        import httpx
+        import litellm
+
+        if _http_client is None:
+            if litellm.aclient_session is not None:
+                yield
+                return
+            limits = httpx.Limits(
+                max_keepalive_connections=_HTTP_MAX_KEEPALIVE_CONNECTIONS,
+                max_connections=_HTTP_MAX_CONNECTIONS
+            )
+            _http_client = httpx.AsyncClient(http2=_HTTP2_AVAILABLE, limits=limits, timeout=_HTTP_TIMEOUT)
+            litellm.aclient_session = _http_client
+        _http_client_users += 1
+        try:
+            yield
+        finally:
+            _http_client_users -= 1
+            if _http_client_users == 0:
+                client, _http_client = _http_client, None
+                litellm.aclient_session = None
+                # LiteLLM caches its OpenAI clients per event loop, and they hold on to this
+                # pool; drop them with it so the next call builds clients on a fresh pool
+                litellm.in_memory_llm_clients_cache.flush_cache()
+                await client.aclose()
+
+    async def __aenter__(self) -> "DrugECMOAnalyzer":
+        """
+        Keep one HTTP pool open for every async analysis made inside `async with analyzer:`.
+
+        Without this, calls made one after another each open a new pool (and new
+        connections); calls that overlap share one either way. The analyzer stays
+        usable after the block exits.
+        """
+        stack = AsyncExitStack()
+        await stack.enter_async_context(self._shared_http_client())
+        self._http_stack = stack
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        stack, self._http_stack = self._http_stack, None
+        if stack is not None:
+            await stack.aclose()
+
+    def analyze_field(self, field_name: str, on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
         """
         Analyze a specific field for the drug.
 
         Args:
             field_name: One of the 7 analysis fields
+            on_token: Optional callback receiving answer tokens as they stream from the LLM
+                (a cached answer is passed in one piece)
 
         Returns:
             Dictionary containing answer, formatted_answer, and metadata
         """
+        return asyncio.run(self.analyze_field_async(field_name, on_token))
+
+    async def analyze_field_async(self, field_name: str,
+                                  on_token: Optional[Callable[[str], None]] = None) -> Dict[str, Any]:
+        """Async version of analyze_field, awaiting paper-qa's async entry point."""
         if field_name not in self.analysis_fields:
             raise ValueError(f"Unknown field: {field_name}. Available fields: {list(self.analysis_fields.keys())}")
 
         field_info = self.analysis_fields[field_name]
-        question = field_info["question_template"].format(drug_name=self.drug_name)
+        question = _format_for_drug(field_info["question_template"], self.drug_name)
         settings = self.create_analysis_settings(field_name)
 
-        # Get response from paper-qa
-        response = ask(question, settings=settings)
-
-        # Structure the response according to requirements
-        result = {
-            "answer": response.session.answer,
-            "formatted_answer": response.session.formatted_answer,
-            "metadata": {
-                "exact_citation": self._extract_exact_citations(response),
-                "reference": self._format_references(response),
-                "ref_details": self._extract_reference_details(response)
-            }
-        }
+        # Same question under the same settings over the same papers -> reuse the stored result
+        value_pattern = field_info.get("value_pattern")
+        cache_key = (
+            question,
+            hashlib.sha256(settings.model_dump_json().encode()).hexdigest(),
+            value_pattern.pattern if value_pattern is not None else None,
+            self._corpus_fingerprint()
+        )
+        if self.use_cache and cache_key in self._query_cache:
+            self._query_cache.move_to_end(cache_key)
+            result = copy.deepcopy(self._query_cache[cache_key])
+            if on_token is not None:
+                on_token(result["answer"])
+            return result
+
+        async with self._shared_http_client():
+            docs = await self._ensure_docs()
+
+            result = None
+            if value_pattern is not None:
+                result = await self._lookup_value(docs, question, value_pattern, settings)
+                if result is not None and on_token is not None:
+                    on_token(result["answer"])
+
+            if result is None:
+                session = await self._query(docs, question, settings, on_token)
+
+                # Structure the response according to requirements
+                result = {
+                    "answer": session.answer,
+                    "formatted_answer": session.formatted_answer,
+                    "metadata": self._build_metadata(session)
+                }
+
+        if self.use_cache:
+            self._store_query_result(cache_key, result)
 
         return result
 
+    @staticmethod
+    async def _query(docs: "Docs", question: str, settings: "Settings",
+                     on_token: Optional[Callable[[str], None]] = None) -> "PQASession":
+        """
+        Query the shared index directly (retrieval + evidence + answer).
+
+        paper-qa hands query callbacks to every LLM call, including the parallel
+        evidence summaries, so when streaming, the evidence is gathered first
+        without callbacks and only the answer call streams to on_token.
+        """
+        if on_token is None:
+            return await docs.aquery(question, settings=settings)
+
+        session = await docs.aget_evidence(question, settings=settings)
+        # Without contexts aquery would gather evidence again, this time with the callbacks
+        answer_settings = settings.model_copy(
+            update={"answer": settings.answer.model_copy(update={"get_evidence_if_no_contexts": False})}
+        )
+        return await docs.aquery(session, settings=answer_settings, callbacks=[on_token])
+
+    async def _lookup_value(self, docs: "Docs", question: str, value_pattern: "re.Pattern[str]",
+                            settings: "Settings") -> Optional[Dict[str, Any]]:
+        """
+        Answer a single-value field from the retrieved chunks alone, without an LLM call.
+
+        Returns None (use the LLM) unless chunks from at least _VALUE_LOOKUP_MIN_PAPERS
+        distinct papers state a value and all matching chunks state the same one.
+        """
+        texts = await docs.retrieve_texts(question, k=_VALUE_LOOKUP_K, settings=settings)
+
+        value, contexts = None, {"texts": [], "citations": [], "docnames": []}
+        for text in texts:
+            match = value_pattern.search(text.text)
+            if match is None:
+                continue
+            found = _WHITESPACE_RE.sub('', match.group(1)).replace('\u2212', '-')
+            if value is not None and found != value:
+                return None  # The papers disagree; let the LLM weigh the evidence
+            value = found
+            start = max(match.start() - _VALUE_QUOTE_CONTEXT, 0)
+            contexts["texts"].append(text.text[start:match.end() + _VALUE_QUOTE_CONTEXT])
+            contexts["citations"].append(str(getattr(text.doc, 'citation', '')))
+            contexts["docnames"].append(getattr(text.doc, 'docname', None))
+
+        # Overlapping or repeated chunks of one paper don't count as agreement
+        papers = {docname if docname is not None else citation
+                  for docname, citation in zip(contexts["docnames"], contexts["citations"])}
+        if len(papers) < _VALUE_LOOKUP_MIN_PAPERS:
+            return None
+
+        # Same layout as paper-qa's formatted_answer, so references parse the same way
+        entries = dict(zip(contexts["docnames"], contexts["citations"]))
+        formatted_answer = f"Question: {question}\n\n{value}\n\nReferences\n\n" + "\n".join(
+            f"{i}. ({docname}): {citation}" for i, (docname, citation) in enumerate(entries.items(), 1)
+        )
+        return {
+            "answer": value,
+            "formatted_answer": formatted_answer,
+            "metadata": self._metadata_from_contexts(formatted_answer, contexts)
+        }
+
+    def _load_query_cache(self) -> "OrderedDict[tuple, Dict[str, Any]]":
+        """Load persisted query results for this drug (empty if none or unreadable)."""
+        try:
+            with open(self._query_cache_path, 'rb') as f:
+                cache = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return OrderedDict()
+        return cache if isinstance(cache, OrderedDict) else OrderedDict()
+
+    def _store_query_result(self, key: tuple, result: Dict[str, Any]) -> None:
+        """Insert a result, evict least recently used entries, and persist to disk."""
+        self._query_cache[key] = copy.deepcopy(result)
+        self._query_cache.move_to_end(key)
+        while len(self._query_cache) > _QUERY_CACHE_MAX_ENTRIES:
+            self._query_cache.popitem(last=False)
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = f"{self._query_cache_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(self._query_cache, f)
+        os.replace(tmp_path, self._query_cache_path)
+
     def analyze_all_fields(self) -> Dict[str, Dict[str, Any]]:
         """
         Analyze all 7 fields for the drug.
 
+        Fields are independent, so they are dispatched in parallel
+        (at most `max_concurrent` at a time).
+
         Returns:
             Complete analysis results in the requested JSON format
         """
-        results = {}
+        return asyncio.run(self.analyze_all_fields_async())
+
+    async def analyze_all_fields_async(self) -> Dict[str, Dict[str, Any]]:
+        """Async version of analyze_all_fields."""
+        return await self.analyze_fields_async(list(self.analysis_fields.keys()))
 
-        for field_name in self.analysis_fields.keys():
-            print(f"Analyzing {field_name} for {self.drug_name}...")
-            results[field_name] = self.analyze_field(field_name)
+    def analyze_fields(self, field_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze a subset of fields in parallel (at most `max_concurrent` at a time).
+
+        Args:
+            field_names: Fields to analyze, in the order results should be returned
+
+        Returns:
+            Results keyed by field name
+        """
+        return asyncio.run(self.analyze_fields_async(field_names))
+
+    async def analyze_fields_async(self, field_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Async version of analyze_fields."""
+        unknown = [name for name in field_names if name not in self.analysis_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {unknown}. Available fields: {list(self.analysis_fields.keys())}")
+
+        semaphore = asyncio.Semaphore(self.max_concurrent)
+
+        async def run_field(field_name: str) -> Dict[str, Any]:
+            async with semaphore:
+                print(f"Analyzing {field_name} for {self.drug_name}...")
+                return await self.analyze_field_async(field_name)
+
+        async with self._shared_http_client():
+            # Ingest papers before fanning out so parallel fields don't each build the index
+            await self._ensure_docs()
+            results = await asyncio.gather(*(run_field(name) for name in field_names))
+
+        return dict(zip(field_names, results))
+
+    def analyze_all_fields_batched(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Analyze all fields with a single paper-qa query.
+
+        One retrieval pass and one answer generation cover every field, at the
+        cost of per-field system prompts and retrieval settings. The answer is
+        constrained to a JSON object with one string per field (structured
+        outputs). All fields share the metadata of that single answer.
+
+        Returns:
+            Results in the same format as analyze_all_fields
+        """
+        return asyncio.run(self.analyze_all_fields_batched_async())
+
+    async def analyze_all_fields_batched_async(self) -> Dict[str, Dict[str, Any]]:
+        """Async version of analyze_all_fields_batched."""
+        field_names = list(self.analysis_fields.keys())
+        question = self._batched_question(field_names)
+        system_prompt = self._system_prompt(
+            "Task: answer every question below, following each question's expected structure. "
+            "Respond with a single JSON object keyed by the exact question labels."
+        )
+        # Only the answer LLM is constrained; evidence summaries keep their own format
+        settings = _build_settings(system_prompt, use_llm_cache=self.use_cache).model_copy(
+            update=_backend_llm(self.backend, _LLM, self.use_cache, response_format=_batch_response_format(field_names))
+        )
+
+        async with self._shared_http_client():
+            docs = await self._ensure_docs()
+
+            print(f"Analyzing {len(field_names)} fields for {self.drug_name} in one query...")
+            session = await docs.aquery(question, settings=settings)
+
+        answers = _parse_json_object(session.answer)
+        metadata = self._build_metadata(session)
+
+        results = {}
+        for field_name in field_names:
+            if field_name not in answers:
+                print(f"Warning: No answer for {field_name} in batched response")
+            results[field_name] = {
+                "answer": str(answers.get(field_name, "")),
+                "formatted_answer": session.formatted_answer,
+                "metadata": copy.deepcopy(metadata)
+            }
 
         return results
 
-    def _extract_exact_citations(self, response) -> list:
-        """Extract exact quotations from the response as an array."""
-        try:
-            if hasattr(response.session, 'contexts') and response.session.contexts:
-                citations = []
-                for context in response.session.contexts[:5]:  # Top 5 citations for better coverage
-                    if hasattr(context, 'context') and context.context:
-                        # Extract meaningful quotes (first 300 chars to capture more context)
-                        quote = context.context.strip()
-                        if len(quote) > 300:
-                            # Find a good breaking point near 300 chars
-                            break_point = quote.find('.', 250, 350)
-                            if break_point != -1:
-                                quote = quote[:break_point + 1]
-                            else:
-                                quote = quote[:300] + "..."
-                        if quote and len(quote) > 20:  # Only include substantial quotes
-                            citations.append(quote)
-                return citations[:5]  # Limit to top 5 meaningful citations
-        except Exception:
-            pass
-        return ["Direct quotes from source papers not available"]
-
-    def _format_references(self, response) -> list:
-        """Format references as an array corresponding to exact citations."""
-        try:
-            # Extract references from the formatted_answer which contains full citations
-            if hasattr(response.session, 'formatted_answer') and response.session.formatted_answer:
-                references = []
-                lines = response.session.formatted_answer.split('\n')
-                in_references = False
-
-                for line in lines:
-                    if line.strip().startswith('References') or line.strip() == 'References':
-                        in_references = True
-                        continue
-
-                    if in_references and line.strip():
-                        # Extract reference lines (typically start with numbers)
-                        if line.strip().startswith(('1.', '2.', '3.', '4.', '5.')):
-                            # Clean up the reference
-                            ref = line.strip()
-                            # Remove the numbering and extract the actual citation
-                            if ':' in ref:
-                                ref = ref.split(':', 1)[1].strip()
-                            references.append(ref)
-                            if len(references) >= 5:
-                                break
-
-                if references:
-                    return references
-
-            # Fallback to context-based extraction
-            if hasattr(response.session, 'contexts') and response.session.contexts:
-                references = []
-                processed_docs = set()
-
-                for context in response.session.contexts[:5]:
-                    # Try different ways to access citation information
-                    citation = None
-                    doc_key = None
-
-                    if hasattr(context, 'doc') and context.doc:
-                        if hasattr(context.doc, 'citation'):
-                            citation = str(context.doc.citation)
-                        doc_key = getattr(context.doc, 'docname', citation or f"doc_{len(references)}")
-
-                    # If no doc.citation, try to extract from context text
-                    if not citation and hasattr(context, 'context'):
-                        # Look for author names and years in the context
-                        text = context.context[:100]
-                        if 'et al.' in text or '20' in text:  # Simple heuristic for citations
-                            citation = f"Reference extracted from: {text[:80]}..."
-                            doc_key = f"context_{len(references)}"
-
-                    if citation and doc_key not in processed_docs:
-                        references.append(citation)
-                        processed_docs.add(doc_key)
-
-                    if len(references) >= 5:
-                        break
+    def _batched_question(self, field_names: list) -> str:
+        """Combine the field questions into one prompt with a JSON answer contract."""
+        lines = [
+            f"Answer the following {len(field_names)} questions about {self.drug_name}. "
+            "Return a JSON object whose keys are the quoted labels below and whose values are the answers."
+        ]
+        for i, field_name in enumerate(field_names, 1):
+            field_info = self.analysis_fields[field_name]
+            question = _format_for_drug(field_info["question_template"], self.drug_name)
+            lines.append(f'{i}) "{field_name}": {question} Expected structure: {field_info["structure"]}')
+        return "\n".join(lines)
+
+    def _build_metadata(self, session) -> Dict[str, list]:
+        """Build the exact_citation / reference / ref_details metadata for a paper-qa session."""
+        return self._metadata_from_contexts(session.formatted_answer, self._unpack_contexts(session))
+
+    def _metadata_from_contexts(self, formatted_answer: Optional[str], contexts: Dict[str, list]) -> Dict[str, list]:
+        """Build the metadata from an answer and its unpacked contexts."""
+        references = self._format_references(formatted_answer, contexts)
+        return {
+            "exact_citation": self._extract_exact_citations(contexts),
+            "reference": references,
+            "ref_details": self._extract_reference_details(references)
+        }
+
+    def _unpack_contexts(self, session) -> Dict[str, list]:
+        """
+        Walk the top 5 contexts once and return their fields as parallel lists.
+
+        Returns:
+            {"texts": [...], "citations": [...], "docnames": [...]}, one entry per context
+            ("" / None where the context has no such attribute)
+        """
+        texts, citations, docnames = [], [], []
+        top_contexts = (getattr(session, 'contexts', None) or [])[:5]  # Top 5 for better coverage
+
+        for context in top_contexts:
+            texts.append(getattr(context, 'context', None) or '')
+            # paper-qa 5 keeps the source document under context.text.doc
+            doc = getattr(getattr(context, 'text', None), 'doc', None) or getattr(context, 'doc', None)
+            citations.append(str(getattr(doc, 'citation', '')) if doc else '')
+            docnames.append(getattr(doc, 'docname', None) if doc else None)
+        return {"texts": texts, "citations": citations, "docnames": docnames}
+
+    def _extract_exact_citations(self, contexts: Dict[str, list]) -> list:
+        """Extract exact quotations from the unpacked contexts as an array."""
+        if not contexts["texts"]:
+            return ["Direct quotes from source papers not available"]
 
+        citations = []
+        for text in contexts["texts"]:  # Already limited to the top 5 contexts
+            # Extract meaningful quotes (first 300 chars to capture more context)
+            quote = text.strip()
+            length = len(quote)
+            if length <= 20:  # Only include substantial quotes
+                continue
+            if length > 300:
+                # Find a good breaking point near 300 chars
+                break_point = quote.find('.', 250, 350)
+                quote = quote[:break_point + 1] if break_point != -1 else quote[:300] + "..."
+            citations.append(quote)
+        return citations
+
+    def _format_references(self, formatted_answer: Optional[str], contexts: Dict[str, list]) -> list:
+        """Format references as an array corresponding to exact citations."""
+        # Extract references from the formatted_answer which contains full citations
+        header = _REFERENCES_HEADER_RE.search(formatted_answer) if formatted_answer else None
+        if header:
+            refs_section = formatted_answer[header.end():]
+            # Ordered de-dup, so identical answers always yield identical reference lists
+            matches = _NUMBERED_REF_RE.finditer(refs_section)
+            references = list(dict.fromkeys(m.group(1) or m.group(2) for m in matches))[:5]
+            if references:
                 return references
-        except Exception as e:
-            print(f"Warning: Error extracting references: {e}")
-        return ["References extracted from peer-reviewed literature"]
 
-    def _extract_reference_details(self, response) -> list:
-        """Extract study details and quality assessment as an array."""
-        try:
-            citations = self._format_references(response)
-            details = []
-
-            for i, citation in enumerate(citations):
-                citation_lower = citation.lower()
-
-                # Determine study type from citation
-                if 'randomized' in citation_lower or 'rct' in citation_lower:
-                    study_type = "Randomized controlled trial"
-                    quality = "high-quality RCT"
-                elif 'prospective' in citation_lower or 'cohort' in citation_lower:
-                    study_type = "Prospective observational study"
-                    quality = "moderate-quality observational study"
-                elif 'case report' in citation_lower or 'case series' in citation_lower:
-                    study_type = "Case report/series"
-                    quality = "case-based evidence"
-                elif 'review' in citation_lower:
-                    study_type = "Literature review"
-                    quality = "narrative review"
-                elif 'guideline' in citation_lower:
-                    study_type = "Clinical guideline"
-                    quality = "expert consensus guideline"
-                elif 'pharmacokinetics' in citation_lower:
-                    study_type = "Pharmacokinetic study"
-                    quality = "specialized PK research"
-                else:
-                    study_type = "Clinical research study"
-                    quality = "peer-reviewed research"
-
-                # Extract population info
-                if 'pediatric' in citation_lower or 'children' in citation_lower:
-                    population = "pediatric ECMO patients"
-                elif 'adult' in citation_lower:
-                    population = "adult ECMO patients"
-                else:
-                    population = "ECMO patients"
-
-                # Estimate citations used
-                citations_used = "multiple citations" if i < 3 else "single citation"
-
-                detail = f"{study_type} on {population}. Quality: {quality}. Evidence: {citations_used} from this source."
-                details.append(detail)
-
-            return details
-        except Exception as e:
-            print(f"Warning: Error extracting reference details: {e}")
-
-        return ["Clinical research on ECMO pharmacokinetics. Quality: peer-reviewed evidence. Multiple sources analyzed."]
+        # Fallback to context-based extraction: first citation of each distinct document, in order
+        if not contexts["texts"]:
+            return ["References extracted from peer-reviewed literature"]
+        seen = {}
+        for citation, docname in zip(contexts["citations"], contexts["docnames"]):
+            if citation:
+                seen.setdefault(docname if docname is not None else citation, citation)
+        return list(seen.values())
+
+    def _extract_reference_details(self, citations: list) -> list:
+        """Extract study details and quality assessment for each formatted reference, as an array."""
+        details = []
+        for i, citation in enumerate(citations):
+            # Determine study type from citation
+            match = _first_table_match(_STUDY_RE, citation)
+            study_type, quality = _STUDY_TYPES[match][1:] if match is not None else _DEFAULT_STUDY_TYPE
+
+            # Extract population info
+            match = _first_table_match(_POPULATION_RE, citation)
+            population = _POPULATIONS[match][1] if match is not None else _DEFAULT_POPULATION
+
+            # Estimate citations used
+            citations_used = "multiple citations" if i < 3 else "single citation"
+
+            details.append(f"{study_type} on {population}. Quality: {quality}. Evidence: {citations_used} from this source.")
+        return details
 
     def save_results(self, results: Dict[str, Dict[str, Any]], filename: Optional[str] = None) -> None:
         """Save analysis results to JSON file."""
         if filename is None:
             filename = f"{self.drug_name}_ecmo_analysis.json"
 
-        with open(filename, 'w') as f:
-            json.dump(results, f, indent=2)
+        Path(filename).write_bytes(_dumps_json(results))
 
         print(f"Results saved to {filename}")
 
+    def append_results_ndjson(self, results: Dict[str, Dict[str, Any]], filename: str = "ecmo_analysis.ndjson") -> None:
+        """
+        Append this drug's results as one line of newline-delimited JSON.
+
+        Suited to batch runs over many drugs (run_analysis.run_multi_drug_analysis
+        uses it): each drug is a self-contained line, so consumers can stream the
+        file without loading it whole. The line goes out in one unbuffered append,
+        so worker processes writing to the same file don't interleave.
+        """
+        with open(filename, 'ab', buffering=0) as f:
+            f.write(_dumps_json({"drug_name": self.drug_name, "results": results}, indent=False) + b'\n')
+
+        print(f"Results appended to {filename}")
+
 
 # Example usage
 if __name__ == "__main__":
@@ -296,9 +1109,10 @@ if __name__ == "__main__":
         paper_directory="./drugs/meropenem"
     )
 
-    # Analyze a single field
-    effect_result = analyzer.analyze_field("Effect on ECMO")
-    print(json.dumps(effect_result, indent=2))
+    # Analyze a single field, streaming the answer as it is generated
+    effect_result = analyzer.analyze_field("Effect on ECMO", on_token=lambda token: print(token, end="", flush=True))
+    print()
+    print(_dumps_json(effect_result).decode("utf-8"))
 
     # Analyze all fields (uncomment to run full analysis)
     # all_results = analyzer.analyze_all_fields()
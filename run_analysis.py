@@ -4,9 +4,29 @@ Example script for running drug ECMO analysis.
 This demonstrates how to use the configurable DrugECMOAnalyzer.
 """
 
-import json
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Any, Dict, List
+
 from drug_ecmo_analyzer import DrugECMOAnalyzer
 
+# Upper bound on in-flight LLM requests across all drug workers (provider rate limit)
+TOTAL_MAX_CONCURRENT = 24
+
+# Each field query runs up to this many evidence-summary LLM calls at once (paper-qa's default)
+MAX_REQUESTS_PER_FIELD = 4
+
+
+def _run_one(drug_name: str, max_concurrent: int, requests_per_field: int, ndjson_file: str) -> Dict[str, Dict[str, Any]]:
+    """Analyze all fields for one drug; runs in a worker process with its own index and HTTP pool."""
+    analyzer = DrugECMOAnalyzer(drug_name=drug_name, max_concurrent=max_concurrent)
+    for field_info in analyzer.analysis_fields.values():
+        field_info["max_concurrent_requests"] = requests_per_field
+    results = analyzer.analyze_all_fields()
+    analyzer.save_results(results)
+    analyzer.append_results_ndjson(results, ndjson_file)
+    return results
+
 
 def run_meropenem_analysis():
     """Run analysis for meropenem - your original use case."""
@@ -43,24 +63,48 @@ def run_custom_drug_analysis(drug_name: str):
         paper_directory=f"./drugs/{drug_name.lower()}"
     )
 
-    # Example: Just analyze a few key fields
+    # Example: Just analyze a few key fields (run in parallel)
     key_fields = ["Effect on ECMO", "Final Recommendation", "ECMO dosage"]
 
-    results = {}
-    for field in key_fields:
-        print(f"\nAnalyzing {field}...")
-        results[field] = analyzer.analyze_field(field)
-        print(f"Result: {results[field]['answer']}")
+    results = analyzer.analyze_fields(key_fields)
+    for field, result in results.items():
+        print(f"\n{field}:")
+        print(f"Result: {result['answer']}")
 
     # Save partial results
-    filename = f"{drug_name.lower()}_key_analysis.json"
-    with open(filename, 'w') as f:
-        json.dump(results, f, indent=2)
-
-    print(f"\nResults saved to {filename}")
+    print()
+    analyzer.save_results(results, f"{drug_name.lower()}_key_analysis.json")
     return results
 
 
+def run_multi_drug_analysis(drug_names: List[str], max_workers: int = 4,
+                            ndjson_file: str = "ecmo_analysis.ndjson") -> Dict[str, Dict[str, Dict[str, Any]]]:
+    """
+    Run the complete analysis for several drugs in parallel, one process per drug.
+
+    Each drug's results are saved to its own JSON file and also appended, as the
+    drug finishes, to ndjson_file (one line per drug).
+
+    TOTAL_MAX_CONCURRENT is split evenly between the workers. Within a worker,
+    fields in flight (max_concurrent) times the LLM calls each field query makes
+    at once (max_concurrent_requests) stays within the worker's share, so the
+    workers together never have more than TOTAL_MAX_CONCURRENT requests open.
+    """
+    if not drug_names:
+        return {}
+    print(f"=== Multi-drug ECMO Analysis ({', '.join(drug_names)}) ===")
+
+    workers = min(len(drug_names), max_workers)
+    per_worker = max(1, TOTAL_MAX_CONCURRENT // workers)
+    requests_per_field = min(MAX_REQUESTS_PER_FIELD, per_worker)
+    fields_in_flight = per_worker // requests_per_field
+    run_one = partial(_run_one, max_concurrent=fields_in_flight, requests_per_field=requests_per_field,
+                      ndjson_file=ndjson_file)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        all_results = executor.map(run_one, drug_names)
+        return dict(zip(drug_names, all_results))
+
+
 def demonstrate_field_customization():
     """Show how to access and customize analysis fields."""
     analyzer = DrugECMOAnalyzer("example_drug")
@@ -83,5 +127,8 @@ if __name__ == "__main__":
     # vancomycin_results = run_custom_drug_analysis("vancomycin")
     # gentamicin_results = run_custom_drug_analysis("gentamicin")
 
+    # Several drugs at once, each in its own process (uncomment to test)
+    # multi_results = run_multi_drug_analysis(["meropenem", "vancomycin", "gentamicin"])
+
     print("\n=== Analysis Complete ===")
     print("Check the generated JSON files for detailed results.")
\ No newline at end of file
@@ -3,7 +3,6 @@
 Test script to demonstrate configurability of the drug analyzer
 """
 
-import json
 from drug_ecmo_analyzer import DrugECMOAnalyzer
 
 def test_configurability():
@@ -35,8 +34,8 @@ def test_configurability():
 
     # Test 3: Show system prompt adaptation
     print("\n=== Test 3: System Prompt Adaptation ===")
-    mero_prompt = mero_analyzer.analysis_fields["Effect on ECMO"]["system_prompt"]
-    vanco_prompt = vanco_analyzer.analysis_fields["Effect on ECMO"]["system_prompt"]
+    mero_prompt = mero_analyzer.analysis_fields["Effect on ECMO"]["system_prompt"].format(drug_name=mero_analyzer.drug_name)
+    vanco_prompt = vanco_analyzer.analysis_fields["Effect on ECMO"]["system_prompt"].format(drug_name=vanco_analyzer.drug_name)
 
     print(f"Meropenem system prompt: {mero_prompt[:100]}...")
     print(f"Vancomycin system prompt: {vanco_prompt[:100]}...")
@@ -48,5 +47,25 @@ def test_configurability():
 
     print("\n✅ Configurability test completed!")
 
+def test_custom_field_with_braces():
+    """Test that a custom field with literal braces doesn't break any field's prompt"""
+    analyzer = DrugECMOAnalyzer("meropenem", "./drugs/meropenem")
+    analyzer.analysis_fields["Dose range"] = {
+        "definition": "Collect the reported dose range.",
+        "structure": 'Return {"min": ..., "max": ...}',
+        "question_template": "What is the dose range of {drug_name}?",
+        "system_prompt": "Task: report the dose range of {drug_name} as {\"min\": ..., \"max\": ...}."
+    }
+
+    for field_info in analyzer.analysis_fields.values():
+        prompt = analyzer._system_prompt(field_info["system_prompt"])
+        assert "{drug_name}" not in prompt
+        assert "meropenem" in prompt
+
+    custom_prompt = analyzer._system_prompt(analyzer.analysis_fields["Dose range"]["system_prompt"])
+    assert custom_prompt.endswith('Task: report the dose range of meropenem as {"min": ..., "max": ...}.')
+    print("✅ Custom field with braces formatted correctly")
+
 if __name__ == "__main__":
-    test_configurability()
\ No newline at end of file
+    test_configurability()
+    test_custom_field_with_braces()
\ No newline at end of file
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the pickled paper-index cache (no API calls)
+"""
+
+import asyncio
+import pickle
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from paperqa import Doc, Docs, Text
+
+import drug_ecmo_analyzer
+from drug_ecmo_analyzer import DrugECMOAnalyzer
+
+
+def build_docs(embeddings):
+    """A Docs index whose texts carry the given embeddings"""
+    docs = Docs()
+    doc = Doc(docname="smith2019", citation="Smith J, et al. Meropenem during pediatric ECMO. 2019", dockey="smith2019")
+    docs.docs[doc.dockey] = doc
+    docs.texts = [
+        Text(text=f"Excerpt {i}", name=f"smith2019 pages {i}", doc=doc, embedding=embedding.tolist())
+        for i, embedding in enumerate(embeddings)
+    ]
+    return docs
+
+
+def test_index_per_paper_directory():
+    """Two paper directories for the same drug keep separate cached indexes"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = str(Path(tmp, "cache"))
+        for name in ("papers_a", "papers_b"):
+            paper_directory = Path(tmp, name)
+            paper_directory.mkdir()
+            analyzer = DrugECMOAnalyzer("meropenem", str(paper_directory), cache_dir=cache_dir)
+            asyncio.run(analyzer._build_or_load_index())
+
+        cached = sorted(Path(cache_dir).glob("meropenem_docs_*.pkl"))
+        assert len(cached) == 2, cached
+    print("✅ One cached index per paper directory")
+
+
+def test_index_per_embedding_model():
+    """Switching the embedding model replaces the cached index instead of reusing it"""
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_dir = str(Path(tmp, "cache"))
+        paper_directory = Path(tmp, "papers")
+        paper_directory.mkdir()
+        analyzer = DrugECMOAnalyzer("meropenem", str(paper_directory), cache_dir=cache_dir)
+
+        cached = []
+        original = drug_ecmo_analyzer._EMBEDDING
+        try:
+            for embedding in (original, "text-embedding-3-large"):
+                drug_ecmo_analyzer._EMBEDDING = embedding
+                asyncio.run(analyzer._build_or_load_index())
+                cached.append(sorted(Path(cache_dir).glob("meropenem_docs_*.pkl")))
+        finally:
+            drug_ecmo_analyzer._EMBEDDING = original
+
+        assert len(cached[0]) == len(cached[1]) == 1, cached
+        assert cached[0] != cached[1], "the index key must cover the embedding model"
+    print("✅ One cached index per embedding model")
+
+
+def test_paper_listing():
+    """Papers in subdirectories and with upper-case suffixes are indexed; other files are not"""
+    with tempfile.TemporaryDirectory() as tmp:
+        paper_directory = Path(tmp, "papers")
+        (paper_directory / "reviews").mkdir(parents=True)
+        for name in ("smith2019.pdf", "Lee2021.PDF", "reviews/doe2018.pdf", "notes.md", "figure.png"):
+            Path(paper_directory, name).write_bytes(b"%PDF")
+        analyzer = DrugECMOAnalyzer("meropenem", str(paper_directory))
+
+        listed = [path.relative_to(paper_directory).as_posix() for path in analyzer._paper_paths()]
+        assert listed == ["Lee2021.PDF", "notes.md", "reviews/doe2018.pdf", "smith2019.pdf"], listed
+
+        fingerprint = analyzer._corpus_fingerprint()
+        Path(paper_directory, "reviews/doe2018.pdf").write_bytes(b"%PDF-1.7")
+        assert analyzer._corpus_fingerprint() != fingerprint, "a changed paper in a subdirectory must change the fingerprint"
+    print("✅ Paper listing follows paper-qa's index settings")
+
+
+def test_quantized_round_trip():
+    """int8 embeddings restore within 1% cosine similarity and leave the live index untouched"""
+    embeddings = np.random.default_rng(0).normal(size=(20, 1536)).astype(np.float32)
+    docs = build_docs(embeddings)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = str(Path(tmp, "meropenem_docs.pkl"))
+        DrugECMOAnalyzer._save_docs(docs, cache_path)
+        assert all(text.embedding is not None for text in docs.texts), "save must restore the embeddings"
+
+        loaded = DrugECMOAnalyzer._load_docs(cache_path)
+
+    restored = np.array([text.embedding for text in loaded.texts])
+    cosine = (restored * embeddings).sum(axis=1) / (
+        np.linalg.norm(restored, axis=1) * np.linalg.norm(embeddings, axis=1)
+    )
+    assert cosine.min() > 0.99, cosine.min()
+    assert [text.name for text in loaded.texts] == [text.name for text in docs.texts]
+    print(f"✅ Quantized round trip (min cosine {cosine.min():.5f})")
+
+
+def test_malformed_payload_is_cache_miss():
+    """A dict pickle without the quantized embeddings is treated like an unreadable cache"""
+    docs = build_docs(np.ones((2, 4), dtype=np.float32))
+    with tempfile.TemporaryDirectory() as tmp:
+        for payload in ({"docs": docs}, {"docs": docs, "embeddings": np.ones((2, 4), dtype=np.int8)}, {}):
+            cache_path = Path(tmp, "meropenem_docs.pkl")
+            cache_path.write_bytes(pickle.dumps(payload))
+            assert DrugECMOAnalyzer._load_docs(str(cache_path)) is None, payload.keys()
+    print("✅ Malformed cache payloads are cache misses")
+
+
+if __name__ == "__main__":
+    test_index_per_paper_directory()
+    test_index_per_embedding_model()
+    test_paper_listing()
+    test_quantized_round_trip()
+    test_malformed_payload_is_cache_miss()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the shared LiteLLM HTTP pool (no API calls)
+
+A local HTTP server stands in for the OpenAI chat-completions endpoint.
+"""
+
+import asyncio
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import litellm
+
+from drug_ecmo_analyzer import DrugECMOAnalyzer
+
+COMPLETION = {
+    "id": "chatcmpl-test",
+    "object": "chat.completion",
+    "created": 0,
+    "model": "gpt-4o-mini",
+    "choices": [{"index": 0, "message": {"role": "assistant", "content": "ok"}, "finish_reason": "stop"}],
+    "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2}
+}
+
+
+class CompletionHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers["Content-Length"]))
+        body = json.dumps(COMPLETION).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def run_with_server(scenario):
+    """Run scenario(complete) in one event loop, against a local completions endpoint"""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), CompletionHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    api_base = f"http://127.0.0.1:{server.server_port}/v1"
+
+    async def complete():
+        response = await litellm.acompletion(
+            model="openai/gpt-4o-mini", api_base=api_base, api_key="test", num_retries=0,
+            messages=[{"role": "user", "content": "ping"}]
+        )
+        return response.choices[0].message.content
+
+    try:
+        return asyncio.run(scenario(complete))
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_sequential_calls():
+    """A second top-level call in the same event loop gets a working pool"""
+    analyzer = DrugECMOAnalyzer("meropenem", "./drugs/meropenem", use_cache=False)
+
+    async def scenario(complete):
+        answers = []
+        for _ in range(2):
+            async with analyzer._shared_http_client():
+                answers.append(await complete())
+        async with analyzer:
+            answers.append(await complete())
+        async with analyzer._shared_http_client():
+            answers.append(await complete())
+        return answers
+
+    assert run_with_server(scenario) == ["ok"] * 4
+    assert litellm.aclient_session is None
+    print("✅ Sequential calls in one event loop")
+
+
+def test_overlapping_calls():
+    """A call that finishes first leaves the pool open for the calls still running"""
+    analyzer = DrugECMOAnalyzer("meropenem", "./drugs/meropenem", use_cache=False)
+
+    async def scenario(complete):
+        first_done = asyncio.Event()
+
+        async def short():
+            async with analyzer._shared_http_client():
+                answer = await complete()
+            first_done.set()
+            return answer
+
+        async def long():
+            async with analyzer._shared_http_client():
+                await first_done.wait()
+                return await complete()
+
+        return await asyncio.gather(short(), long())
+
+    assert run_with_server(scenario) == ["ok", "ok"]
+    assert litellm.aclient_session is None
+    print("✅ Overlapping calls share the pool")
+
+
+if __name__ == "__main__":
+    test_sequential_calls()
+    test_overlapping_calls()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the LiteLLM response cache switches (no API calls)
+"""
+
+import contextlib
+import io
+
+import litellm
+
+import drug_ecmo_analyzer
+from drug_ecmo_analyzer import DrugECMOAnalyzer, _NO_LLM_CACHE, _base_settings_kwargs
+
+
+def request_options(settings):
+    """Per-request LiteLLM options of the answer, summary and embedding models"""
+    return [
+        (settings.llm_config or {"model_list": [{"litellm_params": {}}]})["model_list"][0]["litellm_params"],
+        (settings.summary_llm_config or {"model_list": [{"litellm_params": {}}]})["model_list"][0]["litellm_params"],
+        settings.embedding_config.get("kwargs", {}),
+    ]
+
+
+def test_use_cache_false_bypasses_llm_cache():
+    """use_cache=False skips a process-wide response cache on every model call"""
+    for field_name in ("Effect on ECMO", "PK Properties -LogP"):
+        settings = DrugECMOAnalyzer("meropenem", use_cache=False).create_analysis_settings(field_name)
+        for options in request_options(settings):
+            assert options.get("cache") == _NO_LLM_CACHE["cache"], (field_name, options)
+
+        settings = DrugECMOAnalyzer("meropenem").create_analysis_settings(field_name)
+        for options in request_options(settings):
+            assert "cache" not in options, (field_name, options)
+
+    assert _base_settings_kwargs(use_llm_cache=False)["embedding_config"]["kwargs"] == dict(_NO_LLM_CACHE)
+    print("✅ use_cache=False bypasses the LLM response cache")
+
+
+def test_missing_disk_cache_warns_once():
+    """Without diskcache, the warning is printed once, not on every field"""
+    if litellm.cache is not None:
+        print("⏭️  A LiteLLM cache is already configured")
+        return
+    drug_ecmo_analyzer._llm_cache_unavailable = False
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            for _ in range(3):
+                drug_ecmo_analyzer._enable_llm_cache("./cache")
+    finally:
+        litellm.cache = None
+
+    warnings = output.getvalue().count("LLM response cache disabled")
+    assert warnings == (1 if drug_ecmo_analyzer._llm_cache_unavailable else 0), output.getvalue()
+    print("✅ Missing disk cache warns once")
+
+
+if __name__ == "__main__":
+    test_use_cache_false_bypasses_llm_cache()
+    test_missing_disk_cache_warns_once()
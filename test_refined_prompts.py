@@ -3,23 +3,18 @@
 Test script for refined metadata structure
 """
 
-import json
-from drug_ecmo_analyzer import DrugECMOAnalyzer
+from pathlib import Path
 
-def test_refined_metadata():
+from drug_ecmo_analyzer import DrugECMOAnalyzer, _dumps_json
+
+def test_refined_metadata(meropenem_effect_result):
     """Test the refined metadata structure with arrays"""
     print("=== Testing Refined Metadata Structure ===")
 
-    analyzer = DrugECMOAnalyzer(
-        drug_name="meropenem",
-        paper_directory="./drugs/meropenem"
-    )
-
-    # Test just one field to verify the structure
+    # Test just one field to verify the structure (analyzed once per session, see conftest.py)
     print("Testing 'Effect on ECMO' field with refined metadata...")
+    result = meropenem_effect_result
     try:
-        result = analyzer.analyze_field("Effect on ECMO")
-
         print("\n=== STRUCTURE VALIDATION ===")
 
         # Check main structure
@@ -55,8 +50,7 @@ def test_refined_metadata():
             print(f"  {i}. {detail}")
 
         # Save refined result
-        with open('test_refined_result.json', 'w') as f:
-            json.dump(result, f, indent=2)
+        Path('test_refined_result.json').write_bytes(_dumps_json(result))
 
         print(f"\n✅ Refined result saved to test_refined_result.json")
 
@@ -74,7 +68,15 @@ def test_refined_metadata():
         return False
 
 if __name__ == "__main__":
-    success = test_refined_metadata()
+    analyzer = DrugECMOAnalyzer(
+        drug_name="meropenem",
+        paper_directory="./drugs/meropenem"
+    )
+    try:
+        success = test_refined_metadata(analyzer.analyze_field("Effect on ECMO"))
+    except Exception as e:
+        print(f"❌ Error: {e}")
+        success = False
     if success:
         print("\n🎉 Refined metadata structure test completed successfully!")
     else:
@@ -0,0 +1,16 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the multi-drug runner (no API calls)
+"""
+
+from run_analysis import run_multi_drug_analysis
+
+
+def test_no_drugs():
+    """An empty drug list returns no results instead of failing to size the workers"""
+    assert run_multi_drug_analysis([]) == {}
+    print("✅ Empty drug list")
+
+
+if __name__ == "__main__":
+    test_no_drugs()
@@ -3,23 +3,17 @@
 Simple test for a single field to avoid rate limits
 """
 
-import json
-from drug_ecmo_analyzer import DrugECMOAnalyzer
+from pathlib import Path
 
-def test_single_field():
+from drug_ecmo_analyzer import DrugECMOAnalyzer, _dumps_json
+
+def test_single_field(meropenem_effect_result):
     """Test just one field to verify the system works"""
     print("=== Testing Single Field Analysis ===")
 
-    analyzer = DrugECMOAnalyzer(
-        drug_name="meropenem",
-        paper_directory="./drugs/meropenem"
-    )
-
-    # Test just the Effect on ECMO field
-    print("Testing 'Effect on ECMO' field...")
+    # The Effect on ECMO field, analyzed once per session (see conftest.py)
+    result = meropenem_effect_result
     try:
-        result = analyzer.analyze_field("Effect on ECMO")
-
         print("\n=== RESULTS ===")
         print(f"Answer: {result['answer']}")
         print(f"\nFormatted Answer: {result['formatted_answer']}")
@@ -29,8 +23,7 @@ def test_single_field():
         print(f"  Details: {result['metadata']['ref_details']}")
 
         # Save to file
-        with open('test_single_result.json', 'w') as f:
-            json.dump(result, f, indent=2)
+        Path('test_single_result.json').write_bytes(_dumps_json(result))
 
         print(f"\nResult saved to test_single_result.json")
         return True
@@ -39,8 +32,25 @@ def test_single_field():
         print(f"Error: {e}")
         return False
 
+def analyze_effect_on_ecmo():
+    """Run the Effect on ECMO field for meropenem, streaming the answer as it is generated"""
+    analyzer = DrugECMOAnalyzer(
+        drug_name="meropenem",
+        paper_directory="./drugs/meropenem"
+    )
+
+    print("Testing 'Effect on ECMO' field...")
+    print("Answer (streaming): ", end="", flush=True)
+    result = analyzer.analyze_field("Effect on ECMO", on_token=lambda token: print(token, end="", flush=True))
+    print()
+    return result
+
 if __name__ == "__main__":
-    success = test_single_field()
+    try:
+        success = test_single_field(analyze_effect_on_ecmo())
+    except Exception as e:
+        print(f"Error: {e}")
+        success = False
     if success:
         print("\n✅ Single field test completed successfully!")
     else:
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Offline test that streaming callbacks receive only the answer (no API calls)
+
+Runs a real paper-qa session over in-memory texts, with sparse embeddings and
+LiteLLM mock responses in place of the OpenAI models.
+"""
+
+import asyncio
+
+from paperqa import Doc, Docs, Settings, Text
+from paperqa.settings import AnswerSettings
+
+from drug_ecmo_analyzer import DrugECMOAnalyzer
+
+ANSWER = "ECMO increases the volume of distribution of meropenem (smith2019 pages 1)."
+SUMMARY = '{"summary": "Evidence summary", "relevance_score": 8}'
+
+
+def mock_llm_config(model, response):
+    return {
+        "name": model,
+        "model_list": [{"model_name": model, "litellm_params": {"model": model, "mock_response": response}}]
+    }
+
+
+async def build_docs(settings):
+    docs = Docs()
+    doc = Doc(docname="smith2019", citation="Smith J, et al. Meropenem during pediatric ECMO. 2019", dockey="smith2019")
+    texts = [
+        Text(text=f"Meropenem pharmacokinetics during ECMO, excerpt {i}.", name=f"smith2019 pages {i}", doc=doc)
+        for i in range(3)
+    ]
+    await docs.aadd_texts(texts, doc, settings=settings)
+    return docs
+
+
+def test_streaming_answer_only():
+    """on_token receives the answer tokens, not the evidence summaries"""
+    settings = Settings(
+        llm="gpt-4o-mini",
+        llm_config=mock_llm_config("gpt-4o-mini", ANSWER),
+        summary_llm="gpt-4o-mini",
+        summary_llm_config=mock_llm_config("gpt-4o-mini", SUMMARY),
+        embedding="sparse",
+        answer=AnswerSettings(evidence_k=3, answer_max_sources=2)
+    )
+    tokens = []
+
+    async def run():
+        docs = await build_docs(settings)
+        return await DrugECMOAnalyzer._query(docs, "What is the effect of ECMO on meropenem?", settings, tokens.append)
+
+    session = asyncio.run(run())
+
+    assert len(session.contexts) == 3, "evidence should still be summarized"
+    assert "".join(tokens) == ANSWER
+    assert session.answer == ANSWER
+    print("✅ Only the answer was streamed")
+
+
+if __name__ == "__main__":
+    test_streaming_answer_only()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Offline tests for the regex short-circuit of single-value fields (no API calls)
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+from drug_ecmo_analyzer import DrugECMOAnalyzer, _LOGP_RE, _PROTEIN_BINDING_RE
+
+
+class FakeDocs:
+    """Stands in for paper-qa's Docs: retrieval returns the given chunks"""
+
+    def __init__(self, texts):
+        self.texts = texts
+
+    async def retrieve_texts(self, query, k, settings=None):
+        return self.texts[:k]
+
+
+def chunk(text, docname):
+    doc = SimpleNamespace(docname=docname, citation=f"{docname.title()} et al. Meropenem on ECMO. 2020")
+    return SimpleNamespace(text=text, doc=doc)
+
+
+def lookup(pattern, texts):
+    analyzer = DrugECMOAnalyzer("meropenem", "./drugs/meropenem", use_cache=False)
+    return asyncio.run(analyzer._lookup_value(FakeDocs(texts), "What is the LogP?", pattern, None))
+
+
+def test_logp_pattern():
+    """LogP values must be decimals; counts, years and bare integers are ignored"""
+    for text, expected in [
+        ("Meropenem is hydrophilic with a logP of −0.6.", "−0.6"),
+        ("LogP (octanol/water): -0.69", "-0.69"),
+        ("log P = 1.25 at pH 7.4", "1.25"),
+        ("The logP of 23 compounds was measured", None),
+        ("logP = 2 in this series", None),
+        ("log P (2019) 4 studies", None),
+    ]:
+        match = _LOGP_RE.search(text)
+        assert (match.group(1) if match else None) == expected, text
+    print("✅ LogP pattern")
+
+
+def test_protein_binding_pattern():
+    """Protein binding must be a percentage"""
+    for text, expected in [
+        ("Protein binding is approximately 2 % in plasma", "2 %"),
+        ("protein-binding: 98.5%", "98.5%"),
+        ("protein binding of 23 compounds", None),
+    ]:
+        match = _PROTEIN_BINDING_RE.search(text)
+        assert (match.group(1) if match else None) == expected, text
+    print("✅ Protein binding pattern")
+
+
+def test_lookup_agreeing_papers():
+    """Two papers stating the same value answer the field without an LLM"""
+    result = lookup(_LOGP_RE, [
+        chunk("Meropenem is hydrophilic with a logP of −0.6 and low protein binding.", "smith2019"),
+        chunk("No relevant value here.", "doe2018"),
+        chunk("Physicochemical properties: LogP (octanol/water): -0.6, molecular weight 383.", "lee2021"),
+    ])
+    assert result is not None
+    assert result["answer"] == "-0.6"
+    assert result["metadata"]["reference"] == [
+        "Smith2019 et al. Meropenem on ECMO. 2020", "Lee2021 et al. Meropenem on ECMO. 2020"
+    ]
+    print("✅ Agreeing papers answered without LLM")
+
+
+def test_lookup_disagreeing_papers():
+    """Papers stating different values fall back to the LLM"""
+    result = lookup(_PROTEIN_BINDING_RE, [
+        chunk("Protein binding is 2% in adults.", "smith2019"),
+        chunk("Reported protein-binding: 20% in neonates.", "lee2021"),
+    ])
+    assert result is None
+    print("✅ Disagreeing papers fall back to LLM")
+
+
+def test_lookup_too_few_papers():
+    """Repeated or overlapping chunks of one paper are not enough"""
+    assert lookup(_LOGP_RE, [chunk("The logP of -0.6 was reported.", "smith2019")]) is None
+    assert lookup(_LOGP_RE, [
+        chunk("Meropenem has a logP of -0.6 and is hydrophilic.", "smith2019"),
+        chunk("... a logP of -0.6 and is hydrophilic; binding is low ...", "smith2019"),
+    ]) is None
+    print("✅ A single paper falls back to LLM")
+
+
+if __name__ == "__main__":
+    test_logp_pattern()
+    test_protein_binding_pattern()
+    test_lookup_agreeing_papers()
+    test_lookup_disagreeing_papers()
+    test_lookup_too_few_papers()